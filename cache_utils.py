@@ -0,0 +1,70 @@
+# cache_utils.py
+import logging
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SQLITE_MAX_VARIABLES = 500 # Keys per SELECT ... IN (...) query, well below SQLite's limit
+
+
+class SQLiteCache:
+    """
+    A small persistent key-value store backed by a single SQLite table.
+    Used to memoize the results of paid API calls (embeddings, LLM answers) across runs.
+    Cache failures are reported but never raised, so a broken cache only costs a cache miss.
+    """
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): The SQLite database file. It is created on first use.
+        """
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns the value stored under `key`, or None if it is missing."""
+        return self.get_many([key]).get(key)
+
+    def set(self, key: str, value: bytes) -> None:
+        """Stores `value` under `key`, replacing any previous value."""
+        self.set_many([(key, value)])
+
+    def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """
+        Looks up several keys at once.
+
+        Returns:
+            Dict[str, bytes]: The values found, keyed by their key. Missing keys are omitted.
+        """
+        found = {}
+        try:
+            with self._lock:
+                conn = self._connection()
+                for i in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                    chunk = keys[i:i + SQLITE_MAX_VARIABLES]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows = conn.execute(f"SELECT key, value FROM cache WHERE key IN ({placeholders})", chunk)
+                    found.update(rows)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read from cache '{self.path}': {e}")
+        return found
+
+    def set_many(self, items: Iterable[Tuple[str, bytes]]) -> None:
+        """Stores several (key, value) pairs in a single transaction."""
+        try:
+            with self._lock:
+                conn = self._connection()
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", items)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write to cache '{self.path}': {e}")
@@ -1,11 +1,24 @@
 # config.py
+import functools
+import logging
 import os
 from dotenv import load_dotenv
 
-load_dotenv() # Load variables from .env file
+logger = logging.getLogger(__name__)
+
+@functools.lru_cache(maxsize=1)
+def _load_env() -> dict:
+    """Loads the .env file once and returns the environment variables this config depends on."""
+    load_dotenv() # Load variables from .env file
+    return {
+        "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY"),
+        "QDRANT_URL": os.environ.get("QDRANT_URL", "http://localhost:6333"),
+    }
+
+_env = _load_env()
 
 # --- Environment Variables ---
-GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY") # Needed for Embeddings and LLMs
+GOOGLE_API_KEY = _env["GOOGLE_API_KEY"] # Needed for Embeddings and LLMs
 
 # --- Behavior Control ---
 # Set to True to allow the agent to search the web if retrieved context is not relevant.
@@ -23,25 +36,42 @@ LLM_ANSWER_MODEL = "gemini/gemini-1.5-flash-latest"   # Using litellm prefix
 EMBEDDING_PROVIDER = "google"
 EMBEDDING_MODEL_NAME = "models/text-embedding-004"
 VECTOR_SIZE = 768 # Standard dimension for text-embedding-004
+EMBEDDING_CACHE_PATH = "./.embedding_cache.sqlite3" # On-disk cache of computed embeddings. Set to None to disable.
 
 # --- API Key Checks ---
 if not GOOGLE_API_KEY:
-     print("CRITICAL WARNING: GOOGLE_API_KEY not found in environment variables.")
-     print("                 This is required for BOTH embedding generation and LLM calls in this configuration.")
+     logger.warning("CRITICAL WARNING: GOOGLE_API_KEY not found in environment variables. "
+                    "This is required for BOTH embedding generation and LLM calls in this configuration.")
      # raise ValueError("Missing required GOOGLE_API_KEY for embeddings and LLM calls.")
-else:
-    print("Google API Key found (used for embeddings and LLM tasks).")
 
 # --- LLM Configuration ---
 LLM_MAX_TOKENS = 800
+LLM_TEMPERATURE = 0.3
+LLM_CACHE_PATH = "./.llm_cache.sqlite3" # On-disk cache of LLM responses for identical prompts. Set to None to disable.
 
 # --- Qdrant Configuration ---
-QDRANT_URL = os.environ.get("QDRANT_URL", "http://localhost:6333")
+QDRANT_URL = _env["QDRANT_URL"]
+QDRANT_PREFER_GRPC = True # Use gRPC (binary, HTTP/2) instead of REST for Qdrant operations
+QDRANT_GRPC_PORT = 6334
 COLLECTION_NAME = "agent_rag_index_py_google_emb" # Reflects Google embedding model
+QDRANT_SCALAR_QUANTIZATION = True # Store int8-quantized vectors alongside the originals (applies when the collection is created)
+QDRANT_VECTORS_ON_DISK = True # Keep full-precision vectors on disk; searches run on the in-RAM int8 copy (only with QDRANT_SCALAR_QUANTIZATION; applies when the collection is created)
+QDRANT_QUANTIZATION_OVERSAMPLING = 2.0 # Candidates fetched per result from the int8 index before float32 rescoring
+QDRANT_HNSW_EF = 128 # HNSW beam width at query time. Higher improves recall at the cost of latency
+# Index build threshold (KB of unindexed vectors per segment) restored after bulk uploads. Until that rebuild
+# finishes, searches on the new points fall back to brute force and are slower.
+INDEXING_THRESHOLD = 20000
+UPLOAD_BATCH_SIZE = 256 # Points per upload request
+UPLOAD_PARALLELISM = min(8, os.cpu_count() or 1) # Worker processes used for bulk uploads
+INGEST_PIPELINE_SLICE_SIZE = 1000 # Chunks embedded per step of the ingest pipeline, uploaded while the next step embeds (rounded up to whole waves of concurrent embedding batches)
+INGEST_PIPELINE_QUEUE_SIZE = 4 # Embedded slices allowed to wait for upload before embedding pauses
 
 # --- Text Processing Configuration ---
 CHUNK_SIZE = 150
 CHUNK_OVERLAP = 0
+MIN_CHUNK_CHARS = 20 # Shorter chunks are dropped before embedding
+SPLIT_MAX_WORKERS = min(os.cpu_count() or 1, 4) # Worker processes for splitting; each loads its own tokenizer (~100 MB)
+SPLIT_PARALLEL_MIN_DOCUMENTS = 8 # Fewer documents are split in the main process, which is faster than starting workers
 TEXT_SPLITTER_MODEL = "gpt-4" # For tiktoken length estimate
 
 # --- Data Paths ---
@@ -49,6 +79,7 @@ PDF_FOLDER_PATH = "./rag_data"
 
 # --- Search Configuration ---
 WEB_SEARCH_MAX_RESULTS = 5
+WEB_SEARCH_CACHE_TTL = 60 # Seconds to reuse results for a repeated query
 
 # --- Agent Configuration ---
 RETRIEVAL_TOP_K = 3
@@ -95,13 +126,17 @@ INGEST_URLS = [
 ]
 
 # --- Final Config Printout ---
-print(f"--- Configuration Loaded ---")
-print(f"  LLM Decision Model: {LLM_DECISION_MODEL} (Requires GOOGLE_API_KEY)")
-print(f"  LLM Answer Model:   {LLM_ANSWER_MODEL} (Requires GOOGLE_API_KEY)")
-print(f"  Embedding Provider: {EMBEDDING_PROVIDER}")
-print(f"  Embedding Model:    {EMBEDDING_MODEL_NAME} (Requires GOOGLE_API_KEY)")
-print(f"  Embedding Dim:      {VECTOR_SIZE}")
-print(f"  Qdrant Collection:  {COLLECTION_NAME} at {QDRANT_URL}")
-print(f"  PDF Folder:         {PDF_FOLDER_PATH}")
-print(f"  Web Search Fallback: {'ENABLED' if ALLOW_WEB_SEARCH_FALLBACK else 'DISABLED'}")
-print(f"--------------------------")
\ No newline at end of file
+def log_summary() -> None:
+    """Logs the loaded configuration. Called by the CLI once logging is configured."""
+    if GOOGLE_API_KEY:
+        logger.info("Google API Key found (used for embeddings and LLM tasks).")
+    logger.info("--- Configuration Loaded ---")
+    logger.info(f"  LLM Decision Model: {LLM_DECISION_MODEL} (Requires GOOGLE_API_KEY)")
+    logger.info(f"  LLM Answer Model:   {LLM_ANSWER_MODEL} (Requires GOOGLE_API_KEY)")
+    logger.info(f"  Embedding Provider: {EMBEDDING_PROVIDER}")
+    logger.info(f"  Embedding Model:    {EMBEDDING_MODEL_NAME} (Requires GOOGLE_API_KEY)")
+    logger.info(f"  Embedding Dim:      {VECTOR_SIZE}")
+    logger.info(f"  Qdrant Collection:  {COLLECTION_NAME} at {QDRANT_URL}")
+    logger.info(f"  PDF Folder:         {PDF_FOLDER_PATH}")
+    logger.info(f"  Web Search Fallback: {'ENABLED' if ALLOW_WEB_SEARCH_FALLBACK else 'DISABLED'}")
+    logger.info("--------------------------")
@@ -1,16 +1,95 @@
+import logging
+import multiprocessing
 import os
-import PyPDF2
+import fitz # PyMuPDF
 import requests
-from typing import List, Dict, Optional, Union
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Iterator, List, Dict, Optional, Union
 from tqdm import tqdm
 import config
 
-def read_pdfs_from_folder(folder_path: str) -> List[Dict[str, str]]:
+logger = logging.getLogger(__name__)
+
+# Shared HTTP session so repeated fetches reuse pooled TCP/TLS connections
+HTTP_POOL_CONNECTIONS = 16
+HTTP_POOL_MAXSIZE = 16
+URL_FETCH_MAX_WORKERS = HTTP_POOL_MAXSIZE # One pooled connection per fetch thread
+URL_CONNECT_TIMEOUT = 5 # Seconds to establish a connection
+URL_READ_TIMEOUT = 30 # Seconds to wait for response data
+URL_STREAM_CHUNK_SIZE = 64 * 1024
+MAX_URL_CONTENT_BYTES = 20 * 1024 * 1024 # Guard against runaway pages
+
+_session = requests.Session()
+_adapter = HTTPAdapter(
+    pool_connections=HTTP_POOL_CONNECTIONS,
+    pool_maxsize=HTTP_POOL_MAXSIZE,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+_session.headers.update({"User-Agent": "Agentic-RAG/1.0 (+https://github.com/raoofaltaher/Agentic-RAG)"})
+
+def iter_pdf_pages(file_path: str) -> Iterator[Dict[str, Union[str, int]]]:
+    """
+    Lazily extracts the text of a PDF file one page at a time.
+    Pages without a content stream or with only whitespace (e.g. scanned images) are skipped.
+
+    Args:
+        file_path (str): The path to the PDF file.
+
+    Yields:
+        Dict[str, Union[str, int]]: A dictionary with the 'content', 'source' and
+                                    zero-based 'page' number of each page with text.
+    """
+    filename = os.path.basename(file_path)
+    with fitz.open(file_path) as doc:
+        for page_num, page in enumerate(doc):
+            if not page.get_contents(): # No content stream means there is no text to extract
+                continue
+            # MuPDF's C extractor is far faster than a pure-Python parser
+            page_text = page.get_text("text")
+            if page_text.strip():
+                yield {"content": page_text, "source": filename, "page": page_num}
+
+def _extract_one_pdf(file_path: str) -> Optional[Dict[str, str]]:
+    """
+    Extracts the text content of a single PDF file.
+
+    Defined at module level so it can be pickled and run in a worker process.
+
+    Args:
+        file_path (str): The path to the PDF file.
+
+    Returns:
+        Optional[Dict[str, str]]: A dictionary with the 'content' and 'source' of the PDF,
+                                  or None if the file could not be read or contained no text.
+    """
+    filename = os.path.basename(file_path)
+    try:
+        # Collect page texts and join once instead of growing a string page by page
+        content = "\n".join(page["content"] for page in iter_pdf_pages(file_path)).strip()
+    except Exception as e:
+        logger.error(f"Error reading PDF file {filename} (corrupt or unsupported): {e}")
+        return None
+
+    if not content: # Only add if content was extracted
+        logger.warning(f"No text extracted from {filename}")
+        return None
+    return {
+        "content": content,
+        "source": filename # Use 'source' for consistency
+    }
+
+def read_pdfs_from_folder(folder_path: str, num_workers: int = min(os.cpu_count() or 1, 4)) -> List[Dict[str, str]]:
     """
     Reads all PDF files from a specified folder and extracts their text content.
+    Text extraction is CPU-bound, so files are processed in parallel worker processes.
 
     Args:
         folder_path (str): The path to the folder containing PDF files.
+        num_workers (int): The number of worker processes used for text extraction.
 
     Returns:
         List[Dict[str, str]]: A list of dictionaries, where each dictionary
@@ -19,44 +98,31 @@ def read_pdfs_from_folder(folder_path: str) -> List[Dict[str, str]]:
     """
     pdf_list = []
     if not os.path.isdir(folder_path):
-        print(f"Error: Folder not found at {folder_path}")
+        logger.error(f"Folder not found at {folder_path}")
         return pdf_list
 
-    print(f"Reading PDFs from folder: {folder_path}")
+    logger.debug(f"Reading PDFs from folder: {folder_path}")
     try:
-        file_list = os.listdir(folder_path)
-        pdf_files = [f for f in file_list if f.lower().endswith('.pdf')]
+        # scandir yields file types from the directory listing itself, avoiding a stat per entry
+        with os.scandir(folder_path) as entries:
+            pdf_paths = [entry.path for entry in entries if entry.is_file() and entry.name.lower().endswith('.pdf')]
 
-        if not pdf_files:
-            print(f"No PDF files found in {folder_path}")
+        if not pdf_paths:
+            logger.info(f"No PDF files found in {folder_path}")
             return pdf_list
 
-        for filename in tqdm(pdf_files, desc="Reading PDFs"):
-            file_path = os.path.join(folder_path, filename)
-            try:
-                with open(file_path, 'rb') as file:
-                    reader = PyPDF2.PdfReader(file)
-                    content = ""
-                    for page_num in range(len(reader.pages)):
-                        page = reader.pages[page_num]
-                        page_content = page.extract_text()
-                        if page_content: # Add content only if text extraction was successful
-                            content += page_content + "\n" # Add newline between pages
-
-                    if content: # Only add if content was extracted
-                         pdf_list.append({
-                            "content": content.strip(),
-                            "source": filename # Use 'source' for consistency
-                         })
-                    else:
-                         print(f"Warning: No text extracted from {filename}")
-
-            except Exception as e:
-                print(f"Error reading PDF file {filename}: {e}")
+        # Only the path string crosses the process boundary; chunksize amortizes IPC overhead.
+        # Spawned rather than forked, since the caller may already hold threads (e.g. a gRPC channel to Qdrant).
+        with ProcessPoolExecutor(max_workers=max(1, num_workers), mp_context=multiprocessing.get_context("spawn")) as executor, \
+                tqdm(total=len(pdf_paths), desc="Reading PDFs") as progress:
+            for result in executor.map(_extract_one_pdf, pdf_paths, chunksize=4):
+                progress.update(1)
+                if result is not None:
+                    pdf_list.append(result)
     except Exception as e:
-        print(f"Error accessing folder {folder_path}: {e}")
+        logger.error(f"Error accessing folder {folder_path}: {e}")
 
-    print(f"Successfully read {len(pdf_list)} PDF documents.")
+    logger.info(f"Successfully read {len(pdf_list)} PDF documents.")
     return pdf_list
 
 def fetch_url_content(url: str) -> Optional[str]:
@@ -73,18 +139,26 @@ def fetch_url_content(url: str) -> Optional[str]:
     prefix_url: str = "https://r.jina.ai/"
     full_url: str = prefix_url + url  # Concatenate the prefix URL
 
-    print(f"Fetching content from URL: {url} (via Jina AI)")
+    logger.debug(f"Fetching content from URL: {url} (via Jina AI)")
     try:
-        response = requests.get(full_url, timeout=30) # Add a timeout
-        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-        print(f"Successfully fetched content from {url}")
-        return response.content.decode('utf-8', errors='ignore') # Ignore decoding errors
+        with _session.get(full_url, timeout=(URL_CONNECT_TIMEOUT, URL_READ_TIMEOUT), stream=True) as response:
+            response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
+            # Read the body incrementally into one buffer, stopping at the size cap
+            buffer = bytearray()
+            for chunk in response.iter_content(chunk_size=URL_STREAM_CHUNK_SIZE):
+                buffer.extend(chunk)
+                if len(buffer) >= MAX_URL_CONTENT_BYTES:
+                    logger.warning(f"Content from {url} exceeds {MAX_URL_CONTENT_BYTES} bytes. Truncating.")
+                    del buffer[MAX_URL_CONTENT_BYTES:]
+                    break
+        logger.debug(f"Successfully fetched content from {url}")
+        return buffer.decode('utf-8', errors='ignore') # Ignore decoding errors
 
     except requests.exceptions.RequestException as e:
-        print(f"Error: Failed to fetch URL {full_url}. Exception: {e}")
+        logger.error(f"Failed to fetch URL {full_url}. Exception: {e}")
         return None
     except Exception as e:
-        print(f"An unexpected error occurred while fetching {full_url}: {e}")
+        logger.error(f"An unexpected error occurred while fetching {full_url}: {e}")
         return None
 
 def load_data_sources(urls: List[str] = None, pdf_folder: str = None) -> List[Dict[str, str]]:
@@ -102,8 +176,10 @@ def load_data_sources(urls: List[str] = None, pdf_folder: str = None) -> List[Di
 
     # Load from URLs
     if urls:
-        for url in urls:
-            content = fetch_url_content(url)
+        # Fetching is I/O-bound, so threads overlap the network round-trips
+        with ThreadPoolExecutor(max_workers=min(len(urls), URL_FETCH_MAX_WORKERS)) as executor:
+            contents = list(executor.map(fetch_url_content, urls))
+        for url, content in zip(urls, contents):
             if content:
                 all_documents.append({"content": content, "source": url})
 
@@ -115,6 +191,7 @@ def load_data_sources(urls: List[str] = None, pdf_folder: str = None) -> List[Di
     return all_documents
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     # Example usage (optional: for testing the module directly)
     print("--- Testing Data Loader ---")
 
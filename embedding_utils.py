@@ -3,59 +3,103 @@ import config
 from typing import List, Optional
 import google.generativeai as genai
 import google.api_core.exceptions
+import numpy as np
+import collections
+import hashlib
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import logging
 import time
-import traceback
+from tqdm import tqdm
+from cache_utils import SQLiteCache
+
+logger = logging.getLogger(__name__)
 
 # Configure the Google Generative AI client
 try:
     if config.GOOGLE_API_KEY:
-        genai.configure(api_key=config.GOOGLE_API_KEY)
-        print("Google Generative AI SDK configured successfully.")
+        # gRPC is already the SDK's default transport; pin it so an SDK default change can't switch to REST
+        genai.configure(api_key=config.GOOGLE_API_KEY, transport="grpc")
+        logger.debug("Google Generative AI SDK configured successfully.")
     else:
-        print("Warning: GOOGLE_API_KEY not found during initial configuration. Embedding calls will fail.")
+        logger.warning("GOOGLE_API_KEY not found during initial configuration. Embedding calls will fail.")
 except Exception as e:
-    print(f"Error configuring Google Generative AI SDK: {e}")
-    traceback.print_exc()
+    logger.exception(f"Error configuring Google Generative AI SDK: {e}")
 
 # Rate Limiting (Free tier for text-embedding-004 is often generous, e.g., 1500 QPM)
 # Adjust these if you hit rate limits
 GOOGLE_EMBEDDING_BATCH_SIZE = 100 # Google's batch embed API can handle up to 100 texts per call
 REQUESTS_PER_MINUTE_LIMIT = 1400 # Slightly below the typical 1500 QPM limit
 SECONDS_PER_MINUTE = 60
-DELAY_BETWEEN_BATCHES = SECONDS_PER_MINUTE / REQUESTS_PER_MINUTE_LIMIT * GOOGLE_EMBEDDING_BATCH_SIZE
+EMBEDDING_MAX_CONCURRENCY = 8 # Max batches in flight at once; the rate limiter still caps overall throughput
+EMBEDDING_MAX_ATTEMPTS = 5 # Attempts per batch when the API reports ResourceExhausted
+EMBEDDING_MAX_BACKOFF = 60 # Upper bound in seconds for the jittered exponential backoff
+EMBEDDING_REQUEST_JITTER = 0.05 # Max random delay in seconds before each concurrent batch's first request, so batches don't start in lockstep
 
 
-def get_embeddings(texts: List[str], model: str = config.EMBEDDING_MODEL_NAME, task_type: str = "RETRIEVAL_DOCUMENT") -> Optional[List[List[float]]]:
+class _SlidingWindowRateLimiter:
     """
-    Generates embeddings for a list of texts using the Google Generative AI SDK.
+    Limits the number of embedded texts per rolling minute.
+    Only sleeps when the next request would exceed the budget, instead of after every batch.
+    The budget adapts AIMD-style: it halves when the API throttles us and grows back on success.
+    """
+    def __init__(self, limit: int, window: float = SECONDS_PER_MINUTE, min_limit: int = GOOGLE_EMBEDDING_BATCH_SIZE):
+        self.limit = limit
+        self.max_limit = limit
+        self.min_limit = min_limit
+        self.window = window
+        self._requests = collections.deque() # (timestamp, num_texts) of requests inside the window
+        self._in_window = 0
+        self._lock = threading.Lock()
 
-    Args:
-        texts (List[str]): A list of text strings to embed.
-        model (str): The embedding model name (e.g., "models/text-embedding-004").
-        task_type (str): The type of task for the embedding ("RETRIEVAL_DOCUMENT" for storage,
-                         "RETRIEVAL_QUERY" for search queries, "SEMANTIC_SIMILARITY", etc.).
+    def acquire(self, num_texts: int) -> None:
+        """Blocks until `num_texts` more texts can be sent without exceeding the limit."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._requests and now - self._requests[0][0] >= self.window:
+                    self._in_window -= self._requests.popleft()[1]
+                if not self._requests or self._in_window + num_texts <= self.limit:
+                    self._requests.append((now, num_texts))
+                    self._in_window += num_texts
+                    return
+                sleep_for = self.window - (now - self._requests[0][0])
+            logger.debug(f"Rate limit budget reached, waiting {sleep_for:.2f} seconds...")
+            time.sleep(sleep_for)
 
-    Returns:
-        Optional[List[List[float]]]: A list where each element is an embedding vector (list of floats),
-                                     or None if a fatal error occurs. Returns empty list for empty input.
-    """
-    if not texts:
-        print("Warning: No texts provided for embedding.")
-        return []
+    def on_success(self, num_texts: int) -> None:
+        """Additively grows the budget back towards its configured maximum."""
+        with self._lock:
+            self.limit = min(self.max_limit, self.limit + num_texts)
 
-    if not config.GOOGLE_API_KEY:
-        print(f"ERROR: Cannot generate embeddings. GOOGLE_API_KEY is not configured.")
-        return None
+    def on_throttled(self) -> None:
+        """Halves the budget after the API rejected a request for exceeding its quota."""
+        with self._lock:
+            self.limit = max(self.min_limit, self.limit // 2)
 
-    all_embeddings = []
-    num_texts = len(texts)
-    print(f"Requesting Google embeddings for {num_texts} texts using model '{model}' (Task: {task_type}, Batch size: {GOOGLE_EMBEDDING_BATCH_SIZE})...")
 
-    for i in range(0, num_texts, GOOGLE_EMBEDDING_BATCH_SIZE):
-        batch_texts = texts[i:i + GOOGLE_EMBEDDING_BATCH_SIZE]
-        batch_num = (i // GOOGLE_EMBEDDING_BATCH_SIZE) + 1
-        print(f"  Processing batch {batch_num} ({len(batch_texts)} texts)...")
+_rate_limiter = _SlidingWindowRateLimiter(REQUESTS_PER_MINUTE_LIMIT)
+
+# Persistent content-addressed cache: blake2b(model|task_type|text) -> raw float32 vector bytes
+_embedding_cache = SQLiteCache(config.EMBEDDING_CACHE_PATH) if config.EMBEDDING_CACHE_PATH else None
 
+
+def _embed_batch(batch_texts: List[str], batch_num: int, model: str, task_type: str, jitter: bool = False) -> Optional[List[List[float]]]:
+    """
+    Embeds a single batch of texts, respecting the shared rate limit.
+    ResourceExhausted errors are retried with jittered exponential backoff, up to EMBEDDING_MAX_ATTEMPTS.
+    With `jitter`, the first request is delayed by up to EMBEDDING_REQUEST_JITTER seconds so
+    concurrent batches don't reach the API at the same instant.
+
+    Returns:
+        Optional[List[List[float]]]: The embeddings for the batch, or None on error.
+    """
+    logger.debug(f"Processing batch {batch_num} ({len(batch_texts)} texts)...")
+    for attempt in range(1, EMBEDDING_MAX_ATTEMPTS + 1):
+        _rate_limiter.acquire(len(batch_texts))
+        if jitter and attempt == 1: # Retries are already spread out by the randomized backoff
+            time.sleep(random.random() * EMBEDDING_REQUEST_JITTER)
         try:
             # Use embed_content for batch processing
             result = genai.embed_content(
@@ -63,51 +107,154 @@ def get_embeddings(texts: List[str], model: str = config.EMBEDDING_MODEL_NAME, t
                 content=batch_texts,
                 task_type=task_type
             )
-
-            # Check if the expected 'embedding' key exists and is a list
-            if 'embedding' in result and isinstance(result['embedding'], list):
-                 batch_embeddings = result['embedding']
-                 # Verify that we received the correct number of embeddings
-                 if len(batch_embeddings) == len(batch_texts):
-                      all_embeddings.extend(batch_embeddings)
-                      print(f"  Successfully received embeddings for batch {batch_num}.")
-                 else:
-                     print(f"ERROR: Embedding count mismatch for batch {batch_num}.")
-                     print(f"       Expected {len(batch_texts)}, got {len(batch_embeddings)}.")
-                     # Decide whether to abort or continue. Let's abort for now.
-                     return None
-            else:
-                 print(f"ERROR: Unexpected response structure from Google embedding API for batch {batch_num}.")
-                 print(f"       Result: {result}")
-                 # Abort on unexpected structure
-                 return None
-
         except google.api_core.exceptions.ResourceExhausted as e:
-            print(f"ERROR: Rate limit likely exceeded (ResourceExhausted) during Google embedding request for batch {batch_num}: {e}")
-            print(f"       Consider adjusting rate limit settings in config or check your Google Cloud quotas.")
-            # Potentially add a retry mechanism here with backoff
-            return None # Abort on rate limit error for now
+            _rate_limiter.on_throttled()
+            if attempt == EMBEDDING_MAX_ATTEMPTS:
+                logger.error(f"Rate limit exceeded (ResourceExhausted) during Google embedding request for batch {batch_num} "
+                             f"after {attempt} attempts: {e}. "
+                             f"Consider adjusting rate limit settings in config or check your Google Cloud quotas.")
+                return None
+            delay = min(EMBEDDING_MAX_BACKOFF, 2 ** attempt + random.random())
+            logger.warning(f"Rate limited on batch {batch_num} (attempt {attempt}/{EMBEDDING_MAX_ATTEMPTS}). "
+                           f"Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+            continue
         except google.api_core.exceptions.InvalidArgument as e:
-            print(f"ERROR: Invalid argument during Google embedding request for batch {batch_num}: {e}")
-            print(f"       Check model name ('{model}'), task type ('{task_type}'), and input text content.")
-            traceback.print_exc()
-            return None # Abort on invalid argument
+            logger.exception(f"Invalid argument during Google embedding request for batch {batch_num}: {e}. "
+                             f"Check model name ('{model}'), task type ('{task_type}'), and input text content.")
+            return None
         except Exception as e:
-            print(f"ERROR: An unexpected error occurred during Google embedding generation for batch {batch_num}:")
-            traceback.print_exc()
-            return None # Abort on other errors
+            logger.exception(f"An unexpected error occurred during Google embedding generation for batch {batch_num}:")
+            return None
+
+        _rate_limiter.on_success(len(batch_texts))
+        # Check if the expected 'embedding' key exists and is a list
+        if 'embedding' in result and isinstance(result['embedding'], list):
+             batch_embeddings = result['embedding']
+             # Verify that we received the correct number of embeddings
+             if len(batch_embeddings) == len(batch_texts):
+                  logger.debug(f"Successfully received embeddings for batch {batch_num}.")
+                  return batch_embeddings
+             else:
+                 logger.error(f"Embedding count mismatch for batch {batch_num}. "
+                              f"Expected {len(batch_texts)}, got {len(batch_embeddings)}.")
+                 return None
+        else:
+             logger.error(f"Unexpected response structure from Google embedding API for batch {batch_num}. Result: {result}")
+             return None
+    return None
 
-        # Optional delay to respect rate limits if processing many batches quickly
-        if num_texts > GOOGLE_EMBEDDING_BATCH_SIZE and i + GOOGLE_EMBEDDING_BATCH_SIZE < num_texts:
-             print(f"  Delaying for ~{DELAY_BETWEEN_BATCHES:.2f} seconds before next batch...")
-             time.sleep(DELAY_BETWEEN_BATCHES)
 
+def _embed_uncached(texts: List[str], model: str, task_type: str, show_progress: bool = True) -> Optional[np.ndarray]:
+    """
+    Embeds texts through the API in batches, sending up to EMBEDDING_MAX_CONCURRENCY batches at once.
+
+    Returns:
+        Optional[np.ndarray]: A (len(texts), VECTOR_SIZE) float32 array in input order,
+                              or None if any batch failed.
+    """
+    num_texts = len(texts)
+    logger.debug(f"Requesting Google embeddings for {num_texts} texts using model '{model}' (Task: {task_type}, Batch size: {GOOGLE_EMBEDDING_BATCH_SIZE})...")
+
+    batch_starts = range(0, num_texts, GOOGLE_EMBEDDING_BATCH_SIZE)
+    concurrent = len(batch_starts) > 1 # Only stagger requests when several batches are in flight
+    all_embeddings = np.empty((num_texts, config.VECTOR_SIZE), dtype=np.float32)
+    with ThreadPoolExecutor(max_workers=min(len(batch_starts), EMBEDDING_MAX_CONCURRENCY)) as executor:
+        futures = [
+            executor.submit(_embed_batch, texts[i:i + GOOGLE_EMBEDDING_BATCH_SIZE], batch_num, model, task_type, concurrent)
+            for batch_num, i in enumerate(batch_starts, start=1)
+        ]
+        # Write each batch into its slot so embeddings stay aligned with texts
+        for i, future in zip(batch_starts, tqdm(futures, desc="Embedding batches", disable=not show_progress or len(futures) == 1)):
+            batch_embeddings = future.result()
+            if batch_embeddings is not None:
+                batch_array = np.asarray(batch_embeddings, dtype=np.float32)
+                if batch_array.ndim == 2 and batch_array.shape[1] == config.VECTOR_SIZE:
+                    all_embeddings[i:i + len(batch_array)] = batch_array
+                    continue
+                logger.error(f"Embedding dimension mismatch. Expected {config.VECTOR_SIZE}, got shape {batch_array.shape}.")
+            # Abort on the first failed batch; cancel batches that have not started yet
+            for pending in futures:
+                pending.cancel()
+            return None
+
+    return all_embeddings
+
+
+def _cache_key(model: str, task_type: str, text: str) -> str:
+    """Content-addressed cache key for one embedding."""
+    # BLAKE2b is in the stdlib and hashes faster than SHA-256 on 64-bit CPUs
+    return hashlib.blake2b(f"{model}|{task_type}|{text}".encode("utf-8"), digest_size=32).hexdigest()
+
+
+def get_embeddings(texts: List[str], model: str = config.EMBEDDING_MODEL_NAME, task_type: str = "RETRIEVAL_DOCUMENT",
+                   show_progress: bool = True) -> Optional[np.ndarray]:
+    """
+    Generates embeddings for a list of texts using the Google Generative AI SDK.
+    Duplicate texts are embedded once, and embeddings found in the on-disk cache
+    (config.EMBEDDING_CACHE_PATH) are reused; only the missing texts are sent to the API.
+
+    Args:
+        texts (List[str]): A list of text strings to embed.
+        model (str): The embedding model name (e.g., "models/text-embedding-004").
+        task_type (str): The type of task for the embedding ("RETRIEVAL_DOCUMENT" for storage,
+                         "RETRIEVAL_QUERY" for search queries, "SEMANTIC_SIMILARITY", etc.).
+        show_progress (bool): Show a progress bar over batches. Callers with their own bar pass False.
+
+    Returns:
+        Optional[np.ndarray]: A (len(texts), VECTOR_SIZE) float32 array with one embedding per row,
+                              or None if a fatal error occurs. Returns an empty array for empty input.
+    """
+    if not texts:
+        logger.warning("No texts provided for embedding.")
+        return np.empty((0, config.VECTOR_SIZE), dtype=np.float32)
+
+    # Embed each distinct text once and broadcast the result back to every duplicate
+    unique_index = {}
+    inverse = np.fromiter((unique_index.setdefault(text, len(unique_index)) for text in texts), dtype=np.intp, count=len(texts))
+    unique_texts = list(unique_index)
+    if len(unique_texts) < len(texts):
+        logger.debug(f"Embedding {len(unique_texts)} unique texts out of {len(texts)}.")
+
+    keys = [_cache_key(model, task_type, text) for text in unique_texts]
+    cached = _embedding_cache.get_many(keys) if _embedding_cache else {}
+    # Treat truncated or wrongly sized entries as misses; they are re-embedded and overwritten below
+    expected_bytes = config.VECTOR_SIZE * np.dtype(np.float32).itemsize
+    bad_entries = [key for key, blob in cached.items() if len(blob) != expected_bytes]
+    if bad_entries:
+        logger.warning(f"Ignoring {len(bad_entries)} malformed embedding cache entries.")
+        for key in bad_entries:
+            del cached[key]
+    missing = [i for i, key in enumerate(keys) if key not in cached]
+    if cached:
+        logger.debug(f"Found {len(unique_texts) - len(missing)} of {len(unique_texts)} embeddings in cache.")
+
+    unique_embeddings = np.empty((len(unique_texts), config.VECTOR_SIZE), dtype=np.float32)
+    for i, key in enumerate(keys):
+        if key in cached:
+            unique_embeddings[i] = np.frombuffer(cached[key], dtype=np.float32)
+
+    if missing:
+        if not config.GOOGLE_API_KEY:
+            logger.error("Cannot generate embeddings. GOOGLE_API_KEY is not configured.")
+            return None
+
+        new_embeddings = _embed_uncached([unique_texts[i] for i in missing], model, task_type, show_progress)
+        if new_embeddings is None:
+            return None
+        unique_embeddings[missing] = new_embeddings
+        if _embedding_cache:
+            _embedding_cache.set_many(
+                (keys[i], embedding.tobytes()) for i, embedding in zip(missing, new_embeddings)
+            )
 
-    print(f"Successfully generated {len(all_embeddings)} embeddings in total.")
+    all_embeddings = unique_embeddings if len(unique_texts) == len(texts) else unique_embeddings[inverse]
+    logger.debug(f"Successfully generated {len(all_embeddings)} embeddings in total.")
     return all_embeddings
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     # Example Usage - requires GOOGLE_API_KEY set in .env
     print("\n--- Testing Embedding Utils (Google) ---")
     sample_texts_doc = [
@@ -124,9 +271,9 @@ if __name__ == '__main__':
         print(f"\nRequesting DOCUMENT embeddings for {len(sample_texts_doc)} sample texts...")
         doc_embeddings = get_embeddings(sample_texts_doc, task_type="RETRIEVAL_DOCUMENT")
 
-        if doc_embeddings:
+        if doc_embeddings is not None and len(doc_embeddings):
             print(f"\nSuccessfully obtained {len(doc_embeddings)} document embeddings.")
-            print(f"Dimension of the first embedding: {len(doc_embeddings[0]) if doc_embeddings[0] else 'N/A'}")
+            print(f"Dimension of the first embedding: {doc_embeddings.shape[1]}")
             # print("First embedding vector:", doc_embeddings[0][:10], "...") # Print first few dims
         else:
             print("\nFailed to obtain document embeddings.")
@@ -134,16 +281,16 @@ if __name__ == '__main__':
         print(f"\nRequesting QUERY embedding for: '{sample_text_query}'")
         query_embedding_list = get_embeddings([sample_text_query], task_type="RETRIEVAL_QUERY")
 
-        if query_embedding_list and query_embedding_list[0]:
+        if query_embedding_list is not None and len(query_embedding_list):
             print(f"\nSuccessfully obtained query embedding.")
-            print(f"Dimension of the query embedding: {len(query_embedding_list[0])}")
+            print(f"Dimension of the query embedding: {query_embedding_list.shape[1]}")
         else:
             print("\nFailed to obtain query embedding.")
 
 
     print("\n--- Testing with empty input ---")
     empty_result = get_embeddings([])
-    print(f"Result for empty input: {empty_result}")
+    print(f"Result for empty input: array of shape {empty_result.shape}")
 
     print("\n--- Testing without API key (should print error and return None) ---")
     # Temporarily unset the configured key for testing the check
@@ -4,47 +4,76 @@ from litellm import completion
 from typing import Optional, Dict, List, Tuple
 import config
 import re # Import regex for parsing decision
-import traceback # For detailed error logging
+import hashlib
+import logging
+from cache_utils import SQLiteCache
 
-def call_llm(model: str, system_prompt: str, user_prompt: str, max_tokens: int = config.LLM_MAX_TOKENS) -> Optional[str]:
+logger = logging.getLogger(__name__)
+
+# Decision parsing: prefer a standalone digit, fall back to any 0/1 in the response
+_DECISION_RE = re.compile(r'\b([01])\b')
+_DECISION_FALLBACK_RE = re.compile(r'([01])')
+
+# Prompt templates are fixed, so bind their format methods once
+_format_decision_system_prompt = config.DECISION_SYSTEM_PROMPT.format
+_format_decision_user_prompt = config.DECISION_USER_PROMPT.format
+_format_answer_system_prompt = config.ANSWER_SYSTEM_PROMPT.format
+_format_answer_user_prompt = config.ANSWER_USER_PROMPT.format
+
+# Model prefix -> (API key, key name, provider), resolved once at import.
+# Sorted longest prefix first so more specific prefixes win. Add entries here for other providers.
+_PROVIDERS = sorted([
+    ("gemini/", config.GOOGLE_API_KEY, "GOOGLE_API_KEY", "Google Gemini"),
+    ("gpt-", getattr(config, "OPENAI_API_KEY", None), "OPENAI_API_KEY", "OpenAI GPT"),
+], key=lambda provider: len(provider[0]), reverse=True)
+
+# Persistent cache of LLM responses, keyed by everything that determines the response
+_llm_cache = SQLiteCache(config.LLM_CACHE_PATH) if config.LLM_CACHE_PATH else None
+
+def _cache_key(model: str, temperature: float, max_tokens: int, system_prompt: str, user_prompt: str) -> str:
+    """Cache key for one LLM call."""
+    return hashlib.sha256(f"{model}|{temperature}|{max_tokens}|{system_prompt}|{user_prompt}".encode("utf-8")).hexdigest()
+
+def call_llm(model: str, system_prompt: str, user_prompt: str, max_tokens: int = config.LLM_MAX_TOKENS, use_cache: bool = True) -> Optional[str]:
     """
     Makes a call to the specified LLM using litellm.
     Checks for necessary API keys based on model prefix before calling.
     Explicitly passes the API key for Gemini calls.
+    Identical calls are answered from the on-disk cache (config.LLM_CACHE_PATH) when enabled.
 
     Args:
         model (str): The name of the LLM model to use (e.g., 'gemini/gemini-1.5-flash-latest').
         system_prompt (str): The system message/instruction for the LLM.
         user_prompt (str): The user message/query for the LLM.
         max_tokens (int): The maximum number of tokens to generate.
+        use_cache (bool): Whether to look up and store the response in the cache.
 
     Returns:
         Optional[str]: The content of the LLM's response, or None on error.
     """
+    cache_key = None
+    if use_cache and _llm_cache:
+        cache_key = _cache_key(model, config.LLM_TEMPERATURE, max_tokens, system_prompt, user_prompt)
+        cached = _llm_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Using cached response for LLM call to '{model}'.")
+            return cached.decode("utf-8")
+
     messages = [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": user_prompt}
     ]
 
     # Determine required API key and check if it's available
-    api_key_to_use = None
-    model_provider = "Unknown"
-
-    if model.startswith("gemini/"):
-        api_key_to_use = config.GOOGLE_API_KEY
-        model_provider = "Google Gemini"
-        if not api_key_to_use:
-             print(f"ERROR: LLM Call failed for model '{model}'. GOOGLE_API_KEY is missing.")
-             return None
-    elif model.startswith("gpt-"):
-        api_key_to_use = config.OPENAI_API_KEY # Example if you switch back
-        model_provider = "OpenAI GPT"
-        if not api_key_to_use:
-            print(f"ERROR: LLM Call failed for model '{model}'. OPENAI_API_KEY is missing.")
-            return None
-    # Add elif blocks here for other providers
+    api_key_to_use, key_name, model_provider = next(
+        ((key, name, provider) for prefix, key, name, provider in _PROVIDERS if model.startswith(prefix)),
+        (None, None, "Unknown")
+    )
+    if key_name and not api_key_to_use:
+        logger.error(f"LLM Call failed for model '{model}'. {key_name} is missing.")
+        return None
 
-    print(f"\nAttempting LLM call to '{model}' ({model_provider})...")
+    logger.debug(f"Attempting LLM call to '{model}' ({model_provider})...")
 
     try:
         # <<< MODIFICATION: Explicitly pass api_key >>>
@@ -52,23 +81,23 @@ def call_llm(model: str, system_prompt: str, user_prompt: str, max_tokens: int =
             model=model,
             messages=messages,
             max_tokens=max_tokens,
-            temperature=0.3,
+            temperature=config.LLM_TEMPERATURE,
             api_key=api_key_to_use # Pass the key directly
         )
 
         # Validate response structure before accessing content
         if response and response.choices and response.choices[0].message and response.choices[0].message.content is not None:
              content = response.choices[0].message.content.strip()
-             print(f"LLM '{model}' responded successfully.")
+             logger.debug(f"LLM '{model}' responded successfully.")
+             if cache_key:
+                 _llm_cache.set(cache_key, content.encode("utf-8"))
              return content
         else:
-             print(f"ERROR: Unexpected LLM response structure from model '{model}'.")
-             print(f"       Raw response object: {response}")
+             logger.error(f"Unexpected LLM response structure from model '{model}'. Raw response object: {response}")
              return None
 
     except Exception as e:
-        print(f"ERROR: Exception during LLM call to '{model}':")
-        traceback.print_exc()
+        logger.exception(f"Exception during LLM call to '{model}':")
         return None
 
 
@@ -81,8 +110,8 @@ def get_llm_decision(context: str, question: str) -> Optional[str]:
     Returns '0' (cannot answer) or '1' (can answer), robustly parsing the LLM output.
     Returns None on failure to get a valid decision.
     """
-    system_prompt = config.DECISION_SYSTEM_PROMPT.format(context=context)
-    user_prompt = config.DECISION_USER_PROMPT.format(question=question)
+    system_prompt = _format_decision_system_prompt(context=context)
+    user_prompt = _format_decision_user_prompt(question=question)
 
     raw_decision = call_llm(
         model=config.LLM_DECISION_MODEL,
@@ -92,27 +121,26 @@ def get_llm_decision(context: str, question: str) -> Optional[str]:
     )
 
     if raw_decision is None:
-        print("Error: Failed to get decision response from LLM.")
+        logger.error("Failed to get decision response from LLM.")
         return None # Propagate the error/failure state
 
-    match = re.search(r'\b([01])\b', raw_decision) # Search for whole digit
-    if not match: match = re.search(r'([01])', raw_decision) # Fallback to any digit
+    match = _DECISION_RE.search(raw_decision) or _DECISION_FALLBACK_RE.search(raw_decision)
 
     if match:
         decision = match.group(1) # Get the matched digit ('0' or '1')
-        print(f"  LLM Decision Raw Output: '{raw_decision[:50]}...' -> Parsed Decision: '{decision}'")
+        logger.debug(f"LLM Decision Raw Output: '{raw_decision[:50]}...' -> Parsed Decision: '{decision}'")
         return decision
     else:
-        print(f"WARNING: LLM decision response did not contain a clear '0' or '1'. Received: '{raw_decision[:100]}...'")
-        print(f"         Defaulting decision to '0' (search web) for safety.")
+        logger.warning(f"LLM decision response did not contain a clear '0' or '1'. Received: '{raw_decision[:100]}...'. "
+                       f"Defaulting decision to '0' (search web) for safety.")
         return '0'
 
 def get_llm_answer(context: str, question: str) -> Optional[str]:
     """
     Asks the LLM to generate an answer based *only* on the provided context.
     """
-    system_prompt = config.ANSWER_SYSTEM_PROMPT.format(context=context)
-    user_prompt = config.ANSWER_USER_PROMPT.format(question=question)
+    system_prompt = _format_answer_system_prompt(context=context)
+    user_prompt = _format_answer_user_prompt(question=question)
 
     answer = call_llm(
         model=config.LLM_ANSWER_MODEL,
@@ -122,13 +150,14 @@ def get_llm_answer(context: str, question: str) -> Optional[str]:
     )
 
     if answer is None:
-        print("Error: Failed to get answer response from LLM.")
+        logger.error("Failed to get answer response from LLM.")
         return "Sorry, I encountered an error while generating the answer." # Return error message
     else:
         return answer
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s")
     # Example Usage - requires GOOGLE_API_KEY set in .env
     print("--- Testing LLM Interface (Google LLM) ---")
     sample_context = "Llama 3 is a Large Language Model from Meta AI."
@@ -1,16 +1,53 @@
 # main.py
 import argparse
+import logging
+import multiprocessing
 import time
+import traceback
 import config
-import data_loader
-import text_processing
-import embedding_utils
-import vector_store_interface
-from agent import AgenticRAG
 import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+# Heavy modules (PDF parsing, embeddings, Qdrant, LLM clients) are imported inside the commands that
+# use them, so `--help` and `--clear` don't pay for loading what they never call.
+
+# Loggers owned by this project. Everything else (httpx, litellm, grpc, urllib3) stays at WARNING, so
+# --verbose isn't flooded and request URLs carrying API keys are never logged.
+_PROJECT_LOGGERS = ("__main__", "cache_utils", "config", "data_loader", "embedding_utils", "llm_interface")
+_NOISY_LOGGERS = ("httpx", "LiteLLM")
+
+logger = logging.getLogger(__name__)
+
+def _init_text_splitter():
+    """Warms the cached text splitter once in each worker process."""
+    import text_processing
+    text_processing.get_text_splitter()
+
+def _process_document(doc: Dict[str, str]) -> Tuple[List[str], List[Dict[str, str]]]:
+    """
+    Cleans and splits a single document. Runs in a worker process when the corpus is split in parallel.
+
+    Args:
+        doc (Dict[str, str]): A document with 'content' and 'source'.
+
+    Returns:
+        Tuple[List[str], List[Dict[str, str]]]: The text chunks and one payload per chunk.
+    """
+    import text_processing
+    content = doc.get('content')
+    source = doc.get('source', 'unknown')
+    if not (content and isinstance(content, str)):
+        logger.warning(f"Skipping document from source '{source}' due to missing or invalid content.")
+        return [], []
+    chunks = text_processing.split_cleaned_text(text_processing.clean_text(content), text_processing.get_text_splitter())
+    return chunks, [{"source": source, "content": chunk_content} for chunk_content in chunks] # Payload retains original chunk
 
 def ingest_data():
     """Loads data, processes it, generates embeddings (using Google), and uploads to Qdrant."""
+    import data_loader
+    import vector_store_interface
     print("--- Starting Data Ingestion Process ---")
 
     # Check for essential Google API Key early
@@ -42,59 +79,134 @@ def ingest_data():
 
     # 3. Split documents
     print("\n--- Splitting Documents ---")
-    text_splitter = text_processing.get_text_splitter()
     all_chunks = []
     payloads = []
-    for doc in documents:
-        content = doc.get('content')
-        source = doc.get('source', 'unknown')
-        if content and isinstance(content, str):
-            cleaned_content = text_processing.clean_text(content)
-            if cleaned_content:
-                chunks = text_splitter.split_text(cleaned_content)
-                for chunk_content in chunks:
-                    all_chunks.append(chunk_content) # Store only the text for embedding
-                    payloads.append({"source": source, "content": chunk_content}) # Payload retains original chunk
-        else:
-            print(f"Warning: Skipping document from source '{source}' due to missing or invalid content.")
+    # Cleaning and tokenizer-based splitting are CPU-bound, so larger corpora are split in worker processes.
+    # Each worker loads its own tokenizer, so a handful of documents is split faster in this process.
+    # executor.map preserves input order, which keeps the chunk IDs below deterministic. Workers are spawned, not
+    # forked: the Qdrant client already has a live gRPC channel, and grpcio doesn't support forking around it.
+    if len(documents) < config.SPLIT_PARALLEL_MIN_DOCUMENTS:
+        split_results = [_process_document(doc) for doc in documents]
+    else:
+        with ProcessPoolExecutor(max_workers=min(len(documents), config.SPLIT_MAX_WORKERS), initializer=_init_text_splitter,
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            split_results = list(executor.map(_process_document, documents, chunksize=4))
+    for chunks, chunk_payloads in split_results:
+        all_chunks.extend(chunks) # Store only the text for embedding
+        payloads.extend(chunk_payloads)
+
+    # Drop empty and near-empty chunks (e.g. stray boundary fragments) so they don't cost embedding calls
+    kept = [i for i, chunk in enumerate(all_chunks) if len(chunk) >= config.MIN_CHUNK_CHARS and chunk.strip()]
+    dropped = len(all_chunks) - len(kept)
+    if dropped:
+        print(f"Dropped {dropped} chunks shorter than {config.MIN_CHUNK_CHARS} characters or containing only whitespace.")
+        all_chunks = [all_chunks[i] for i in kept]
+        payloads = [payloads[i] for i in kept]
 
     if not all_chunks:
         print("No text chunks generated after splitting. Ingestion finished."); return
     print(f"Generated {len(all_chunks)} chunks.")
 
-    # 4. Generate Embeddings using Google API
-    print("\n--- Generating Embeddings (using Google API) ---")
-    # <<< Calls the updated embedding_utils.get_embeddings >>>
-    all_embeddings = embedding_utils.get_embeddings(
-        all_chunks,
-        task_type="RETRIEVAL_DOCUMENT" # Specify task type for storage
-    )
-
-    # Check if embedding generation was successful
-    if all_embeddings is None:
-        print(f"ERROR: Failed to generate embeddings using Google API. Aborting ingestion.")
-        # embedding_utils function already printed detailed errors
-        return
-
-    if len(all_embeddings) != len(all_chunks):
-         print(f"ERROR: Mismatch between number of chunks ({len(all_chunks)}) and generated embeddings ({len(all_embeddings)}). Aborting.")
-         return
-
-    print(f"Successfully generated {len(all_embeddings)} embeddings.")
-
-    # 5. Upload to Vector Store
-    print("\n--- Uploading to Vector Store ---")
+    # 4-5. Generate Embeddings using Google API and upload them to the Vector Store
+    print("\n--- Generating Embeddings (using Google API) and Uploading to Vector Store ---")
     ids = list(range(len(all_chunks)))
     if len(payloads) != len(ids): # Sanity check
          print(f"ERROR: Mismatch between number of IDs ({len(ids)}) and payloads ({len(payloads)}). Aborting upload.")
          return
 
-    uploaded = qdrant_store.upload_data(ids=ids, vectors=all_embeddings, payloads=payloads)
+    uploaded = _embed_and_upload(qdrant_store, ids, all_chunks, payloads)
     if uploaded:
         print("\n--- Data Ingestion Process Completed Successfully ---")
         final_count = qdrant_store.count(); print(f"Collection '{config.COLLECTION_NAME}' now contains {final_count} points.")
     else:
-        print("\n--- Data Ingestion Process Failed During Upload ---")
+        print("\n--- Data Ingestion Process Failed ---")
+
+
+def _embed_and_upload(qdrant_store, ids: List[int], chunks: List[str], payloads: List[Dict[str, str]]) -> bool:
+    """
+    Embeds chunks slice by slice and uploads each slice from a background thread,
+    so the upload of one slice overlaps with embedding the next. Identical chunks are
+    embedded once and stored as one point per occurrence, each keeping its own payload.
+
+    Args:
+        qdrant_store (QdrantVectorStore): The store to upload to.
+        ids (List[int]): Point IDs, one per chunk.
+        chunks (List[str]): The chunk texts to embed.
+        payloads (List[Dict[str, str]]): Payloads, one per chunk.
+
+    Returns:
+        bool: True if every slice was embedded and uploaded, False otherwise.
+    """
+    import embedding_utils
+    from tqdm import tqdm
+    # Round slices up to whole waves of concurrent batches, so the embedding pool isn't left
+    # mostly idle while the last few batches of each slice finish
+    wave_size = embedding_utils.GOOGLE_EMBEDDING_BATCH_SIZE * embedding_utils.EMBEDDING_MAX_CONCURRENCY
+    slice_size = -(-config.INGEST_PIPELINE_SLICE_SIZE // wave_size) * wave_size
+    # Bounded queue: embedding blocks when uploads fall behind, so memory stays flat
+    upload_queue = queue.Queue(maxsize=config.INGEST_PIPELINE_QUEUE_SIZE)
+    upload_failed = threading.Event()
+    # Repeated chunks (headers, footers, boilerplate) map to every position they occur at
+    occurrences: Dict[str, List[int]] = {}
+    for position, chunk in enumerate(chunks):
+        occurrences.setdefault(chunk, []).append(position)
+    unique_chunks = list(occurrences)
+    if len(unique_chunks) < len(chunks):
+        print(f"Embedding {len(unique_chunks)} unique chunks ({len(chunks) - len(unique_chunks)} duplicates reuse their vectors).")
+
+    def upload_worker():
+        while True:
+            item = upload_queue.get()
+            if item is None: # End of stream
+                return
+            slice_ids, slice_vectors, slice_payloads, is_last = item
+            if upload_failed.is_set():
+                continue # Drain remaining slices after a failure
+            # Only wait for the final slice to be persisted; Qdrant applies updates in order.
+            # A single upload process per slice, since overlapping with embedding already provides the concurrency.
+            if not qdrant_store.upload_data(ids=slice_ids, vectors=slice_vectors, payloads=slice_payloads,
+                                            parallel=1, wait=is_last, verbose=False):
+                upload_failed.set()
+
+    embedded = 0
+    # One progress bar for the whole pipeline; slices don't draw their own
+    with qdrant_store.deferred_indexing(), tqdm(total=len(unique_chunks), desc="Embedding chunks") as progress:
+        uploader = threading.Thread(target=upload_worker, daemon=True)
+        uploader.start()
+        try:
+            for start in range(0, len(unique_chunks), slice_size):
+                if upload_failed.is_set():
+                    break
+                slice_chunks = unique_chunks[start:start + slice_size]
+                slice_embeddings = embedding_utils.get_embeddings(
+                    slice_chunks,
+                    task_type="RETRIEVAL_DOCUMENT", # Specify task type for storage
+                    show_progress=False
+                )
+                # Check if embedding generation was successful
+                if slice_embeddings is None:
+                    print(f"ERROR: Failed to generate embeddings using Google API. Aborting ingestion.")
+                    # embedding_utils function already logged detailed errors
+                    break
+                if len(slice_embeddings) != len(slice_chunks):
+                    print(f"ERROR: Mismatch between number of chunks ({len(slice_chunks)}) and generated embeddings ({len(slice_embeddings)}). Aborting.")
+                    break
+                embedded += len(slice_embeddings)
+                progress.update(len(slice_embeddings))
+                is_last = start + slice_size >= len(unique_chunks)
+                # Fan each vector out to every occurrence of its chunk
+                rows = [row for row, chunk in enumerate(slice_chunks) for _ in occurrences[chunk]]
+                positions = [position for chunk in slice_chunks for position in occurrences[chunk]]
+                upload_queue.put(([ids[p] for p in positions], slice_embeddings[rows],
+                                  [payloads[p] for p in positions], is_last))
+        finally:
+            upload_queue.put(None)
+            uploader.join()
+
+    print(f"Successfully generated {embedded} of {len(unique_chunks)} embeddings.")
+    if upload_failed.is_set():
+        print("ERROR: Uploading to the vector store failed.")
+    return embedded == len(unique_chunks) and not upload_failed.is_set()
 
 
 def run_agent(question: str):
@@ -106,6 +218,7 @@ def run_agent(question: str):
         return
 
     try:
+        from agent import AgenticRAG
         agent = AgenticRAG()
         start_time = time.time()
         answer = agent.process_query(question)
@@ -126,8 +239,16 @@ def main():
     parser.add_argument("--ingest", action="store_true", help="Run the data ingestion pipeline.")
     parser.add_argument("--query", type=str, help="Ask a question to the Agentic RAG system.")
     parser.add_argument("--clear", action="store_true", help="Delete the existing Qdrant collection before any other action.")
+    parser.add_argument("--verbose", action="store_true", help="Show detailed per-file, per-batch and per-call logging.")
     args = parser.parse_args()
 
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s: %(message)s")
+    for name in _PROJECT_LOGGERS:
+        logging.getLogger(name).setLevel(logging.DEBUG if args.verbose else logging.INFO)
+    for name in _NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(logging.WARNING)
+    config.log_summary()
+
     # Ensure necessary directories/config exist
     if not os.path.exists(config.PDF_FOLDER_PATH):
         try: os.makedirs(config.PDF_FOLDER_PATH); print(f"Created data directory: {config.PDF_FOLDER_PATH}")
@@ -139,6 +260,7 @@ def main():
          print(f"--- Clearing Collection '{config.COLLECTION_NAME}' ---")
          try:
              # Need to initialize client even for delete
+             import vector_store_interface
              qdrant_store = vector_store_interface.QdrantVectorStore()
              qdrant_store.delete_collection()
              print(f"Collection '{config.COLLECTION_NAME}' cleared.")
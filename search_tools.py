@@ -1,10 +1,15 @@
+import time
 from duckduckgo_search import DDGS
-from typing import List, Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import config
 
+# (query, max_results) -> (timestamp, results); agent loops often repeat the same query
+_search_cache: Dict[Tuple[str, int], Tuple[float, List[Dict]]] = {}
+
 def web_search(query: str, max_results: int = config.WEB_SEARCH_MAX_RESULTS) -> Optional[List[Dict]]:
     """
     Performs a web search using DuckDuckGo.
+    Results are cached for config.WEB_SEARCH_CACHE_TTL seconds per (query, max_results).
 
     Args:
         query (str): The search query.
@@ -14,21 +19,33 @@ def web_search(query: str, max_results: int = config.WEB_SEARCH_MAX_RESULTS) ->
         Optional[List[Dict]]: A list of search result dictionaries (typically
                               containing 'title', 'href', 'body'), or None on error.
     """
+    cache_key = (query, max_results)
+    now = time.monotonic()
+    cached = _search_cache.get(cache_key)
+    if cached and now - cached[0] < config.WEB_SEARCH_CACHE_TTL:
+        print(f"Using cached web search results for: '{query}'")
+        return cached[1]
+
     print(f"Performing web search for: '{query}' (max {max_results} results)")
     try:
         with DDGS() as ddgs:
             results = list(ddgs.text(query, max_results=max_results))
-            # Sometimes ddgs.text might yield fewer results than requested or none
-            if results:
-                 print(f"Found {len(results)} results from web search.")
-                 return results
-            else:
-                 print("Web search returned no results.")
-                 return []
     except Exception as e:
         print(f"Error during web search: {e}")
         return None
 
+    # Drop expired entries so the cache doesn't grow without bound
+    for key in [key for key, (timestamp, _) in _search_cache.items() if now - timestamp >= config.WEB_SEARCH_CACHE_TTL]:
+        del _search_cache[key]
+    _search_cache[cache_key] = (now, results)
+
+    # Sometimes ddgs.text might yield fewer results than requested or none
+    if results:
+         print(f"Found {len(results)} results from web search.")
+    else:
+         print("Web search returned no results.")
+    return results
+
 def format_search_results(results: Optional[List[Dict]]) -> str:
     """
     Formats DuckDuckGo search results into a single string context.
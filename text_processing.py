@@ -1,11 +1,23 @@
+import functools
 import re
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from typing import List
 import config # Import config for parameters
 
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Load the tiktoken encoding once at import; tiktoken keeps it cached for the splitter
+try:
+    import tiktoken
+    tiktoken.encoding_for_model(config.TEXT_SPLITTER_MODEL)
+except Exception as e: # tiktoken missing or the BPE file could not be fetched; the splitter will retry
+    print(f"Warning: Could not preload tiktoken encoding for '{config.TEXT_SPLITTER_MODEL}': {e}")
+
+@functools.lru_cache(maxsize=None)
 def get_text_splitter() -> RecursiveCharacterTextSplitter:
     """
     Initializes and returns a RecursiveCharacterTextSplitter based on config.
+    The splitter is created once and shared by later calls.
 
     Returns:
         RecursiveCharacterTextSplitter: An instance of the text splitter.
@@ -29,16 +41,28 @@ def clean_text(text: str) -> str:
     if not isinstance(text, str):
         return "" # Return empty string if input is not a string
 
-    # Remove all newline characters
-    text = text.replace('\n', ' ').replace('\r', ' ')
+    # Fast path: printable text has no whitespace other than ' ', so without double spaces there is nothing to collapse
+    if text.isprintable() and '  ' not in text:
+        return text.strip()
 
-    # Replace multiple spaces with a single space
-    text = re.sub(r'\s+', ' ', text)
+    # Collapse every whitespace run (including newlines) to a single space in one pass, then strip the ends
+    return _WHITESPACE_RE.sub(' ', text).strip()
 
-    # Strip leading and trailing spaces
-    text = text.strip()
+def split_cleaned_text(text: str, text_splitter: RecursiveCharacterTextSplitter) -> List[str]:
+    """
+    Splits text that has already been passed through clean_text. No cleaning is done here,
+    so callers that clean the text themselves don't pay for it twice.
+
+    Args:
+        text (str): The cleaned input text.
+        text_splitter (RecursiveCharacterTextSplitter): The splitter instance to use.
 
-    return text
+    Returns:
+        List[str]: A list of text chunks (empty if the text is empty).
+    """
+    if not text:
+        return []
+    return text_splitter.split_text(text)
 
 def split_documents(documents: List[dict], text_splitter: RecursiveCharacterTextSplitter) -> List[str]:
     """
@@ -55,10 +79,7 @@ def split_documents(documents: List[dict], text_splitter: RecursiveCharacterText
     print(f"Splitting {len(documents)} documents...")
     for doc in documents:
         if 'content' in doc and isinstance(doc['content'], str):
-            cleaned_content = clean_text(doc['content'])
-            if cleaned_content: # Proceed only if content is not empty after cleaning
-                chunks = text_splitter.split_text(cleaned_content)
-                all_chunks.extend(chunks)
+            all_chunks.extend(split_cleaned_text(clean_text(doc['content']), text_splitter))
         else:
             source = doc.get('source', 'Unknown source')
             print(f"Warning: Document from '{source}' has missing or invalid 'content'. Skipping.")
@@ -77,10 +98,7 @@ def split_text_direct(text: str, text_splitter: RecursiveCharacterTextSplitter)
     Returns:
         List[str]: A list of text chunks.
     """
-    cleaned_text = clean_text(text)
-    if not cleaned_text:
-        return []
-    chunks = text_splitter.split_text(cleaned_text)
+    chunks = split_cleaned_text(clean_text(text), text_splitter)
     print(f"Split text into {len(chunks)} chunks.")
     return chunks
 
@@ -2,14 +2,18 @@
 
 # ...(imports and class definition as before)...
 from qdrant_client import QdrantClient, models
-from qdrant_client.http.models import Distance, VectorParams, PointStruct, UpdateStatus
+from qdrant_client.http.models import Distance, VectorParams, PointStruct
 from qdrant_client.http import models as rest
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
+import numpy as np
 import config
+import contextlib
 import time
-import embedding_utils # Import for embedding generation during search
 import traceback
 
+_format_document = "Retrieved Document {index} (Source: {source}, Score: {score:.4f}):\n{content}".format
+_MISSING_PAYLOAD = {"content": "Payload missing or invalid", "source": "Unknown Source"}
+
 class QdrantVectorStore:
     """
     A wrapper class for interacting with a Qdrant vector store collection.
@@ -24,7 +28,17 @@ class QdrantVectorStore:
         """
         print(f"Initializing Qdrant client for URL: {url}")
         try:
-            self.client = QdrantClient(url=url, timeout=60)
+            # gRPC sends binary protobuf over a multiplexed HTTP/2 channel; keepalive holds it open between calls
+            self.client = QdrantClient(
+                url=url,
+                prefer_grpc=config.QDRANT_PREFER_GRPC,
+                grpc_port=config.QDRANT_GRPC_PORT,
+                grpc_options={
+                    "grpc.keepalive_time_ms": 10000,
+                    "grpc.max_send_message_length": 100 * 1024 * 1024, # Large upload batches exceed the 4 MB default
+                },
+                timeout=60
+            )
             print("Qdrant client initialized. Connection will be verified by subsequent operations.")
         except Exception as e:
             print(f"ERROR during Qdrant client initialization for {url}:")
@@ -32,23 +46,37 @@ class QdrantVectorStore:
             raise ConnectionError(f"Could not initialize or connect to Qdrant client at {url}") from e
 
         self.collection_name = collection_name
+        self._indexing_deferred = False
+        self._exists_cache: Optional[bool] = None
         print(f"Target collection: {self.collection_name}")
         # Crucially uses config.VECTOR_SIZE when creating collection below
 
-    def collection_exists(self) -> bool:
+    def collection_exists(self, refresh: bool = False) -> bool:
         # ... (Keep this method as previously updated - without health_check) ...
-        """Checks if the configured collection exists by trying to list collections."""
+        """
+        Checks if the configured collection exists.
+        The answer is cached after the first successful check and kept up to date by
+        create_collection/delete_collection, so most operations skip the round-trip.
+        Args:
+            refresh (bool): Ask Qdrant even if a cached answer is available.
+        """
+        if self._exists_cache is not None and not refresh:
+            return self._exists_cache
         # print(f"Checking if collection '{self.collection_name}' exists...") # reduce verbosity
         try:
-            collections_response = self.client.get_collections()
-            exists = any(col.name == self.collection_name for col in collections_response.collections)
+            self._exists_cache = self.client.collection_exists(collection_name=self.collection_name)
             # print(f"Collection '{self.collection_name}' exists: {exists}") # reduce verbosity
-            return exists
+            return self._exists_cache
         except Exception as e:
             print(f"Error checking for collection '{self.collection_name}' (potential connection issue): {e}")
             # traceback.print_exc() # Only show traceback if needed
+            self._exists_cache = None # Don't cache failures
             return False
 
+    def invalidate_collection_cache(self) -> None:
+        """Forgets the cached collection_exists() answer, e.g. after the collection was changed elsewhere."""
+        self._exists_cache = None
+
     def create_collection(self, vector_size: int = config.VECTOR_SIZE, distance: Distance = Distance.COSINE) -> bool:
         # ... (Keep this method as previously updated - without health_check) ...
         """
@@ -68,13 +96,22 @@ class QdrantVectorStore:
 
         print(f"Attempting to create collection '{self.collection_name}' with vector size {vector_size} and distance {distance}...")
         try:
+            # Let Qdrant keep an int8 copy of each vector for search (4x smaller than float32)
+            quantization_config = models.ScalarQuantization(
+                scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+            ) if config.QDRANT_SCALAR_QUANTIZATION else None
             self.client.create_collection(
                 collection_name=self.collection_name,
-                vectors_config=VectorParams(size=vector_size, distance=distance),
+                # With quantization on, full-precision originals are only read for rescoring, so they can live on disk.
+                # Without it every search reads them, so they stay in RAM.
+                vectors_config=VectorParams(size=vector_size, distance=distance,
+                                            on_disk=config.QDRANT_VECTORS_ON_DISK and config.QDRANT_SCALAR_QUANTIZATION),
+                quantization_config=quantization_config,
+                optimizers_config=models.OptimizersConfigDiff(indexing_threshold=config.INDEXING_THRESHOLD),
                 timeout=30
             )
             time.sleep(1)
-            if self.collection_exists():
+            if self.collection_exists(refresh=True):
                 print(f"Collection '{self.collection_name}' created successfully.")
                 return True
             else:
@@ -84,7 +121,7 @@ class QdrantVectorStore:
             print(f"ERROR creating collection '{self.collection_name}': {e}")
             traceback.print_exc()
             try: # Fallback check
-                if self.collection_exists():
+                if self.collection_exists(refresh=True):
                      print(f"Warning: Creation API call failed, but collection '{self.collection_name}' seems to exist now.")
                      return True
             except Exception: pass
@@ -103,51 +140,99 @@ class QdrantVectorStore:
              time.sleep(1)
              if result:
                  print(f"Collection '{self.collection_name}' delete operation returned success.")
-                 if not self.collection_exists(): return True
+                 if not self.collection_exists(refresh=True): return True
                  else: print(f"ERROR: Collection '{self.collection_name}' still exists after delete success."); return False
              else:
                  print(f"Warning: Delete operation for '{self.collection_name}' returned False. Checking status...")
-                 if not self.collection_exists(): print(f"Confirmed deleted despite False return."); return True
+                 if not self.collection_exists(refresh=True): print(f"Confirmed deleted despite False return."); return True
                  else: print(f"ERROR: Collection '{self.collection_name}' still exists after delete returned False."); return False
         except Exception as e:
             print(f"ERROR during deletion of collection '{self.collection_name}': {e}"); traceback.print_exc(); return False
 
 
-    def upload_data(self, ids: List[int], vectors: List[List[float]], payloads: List[Dict[str, Any]], batch_size: int = 128) -> bool:
+    def _set_indexing_threshold(self, threshold: int) -> None:
+        """Updates the collection's HNSW indexing threshold (0 disables index building)."""
+        self.client.update_collection(
+            collection_name=self.collection_name,
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=threshold)
+        )
+
+    @contextlib.contextmanager
+    def deferred_indexing(self):
+        """
+        Pauses HNSW index building for the duration of a bulk upload and restores it to
+        config.INDEXING_THRESHOLD afterwards, which triggers one index build over all new points.
+        Nested uses are no-ops, so several upload_data calls can share one pause.
+        Failing to change the threshold is reported but does not abort the upload.
+        """
+        if self._indexing_deferred:
+            yield
+            return
+        try:
+            self._set_indexing_threshold(0)
+        except Exception as e:
+            print(f"Warning: Could not pause indexing for '{self.collection_name}': {e}")
+        self._indexing_deferred = True
+        try:
+            yield
+        finally:
+            self._indexing_deferred = False
+            try:
+                self._set_indexing_threshold(config.INDEXING_THRESHOLD)
+            except Exception as e:
+                print(f"ERROR: Could not restore indexing for '{self.collection_name}': {e}")
+
+    def upload_data(self, ids: List[int], vectors: Union[np.ndarray, List[List[float]]], payloads: List[Dict[str, Any]],
+                    batch_size: int = config.UPLOAD_BATCH_SIZE, parallel: int = config.UPLOAD_PARALLELISM, wait: bool = True,
+                    verbose: bool = True) -> bool:
         # ... (Keep this method as previously updated) ...
         """
         Uploads vectors and payloads to the Qdrant collection.
+        Points are sent in batches from several worker processes, with HNSW indexing paused until the upload finishes.
         Args:
             ids (List[int]): A list of unique integer IDs for the points.
-            vectors (List[List[float]]): A list of embedding vectors.
+            vectors (Union[np.ndarray, List[List[float]]]): The embedding vectors, one per row.
+                Ideally a C-contiguous float32 array, as returned by embedding_utils.get_embeddings.
             payloads (List[Dict[str, Any]]): A list of corresponding metadata payloads.
-            batch_size (int): Max points per GRPC message (Qdrant default is often good).
+            batch_size (int): Points per upload request.
+            parallel (int): Number of worker processes sending batches concurrently.
+            wait (bool): Whether to block until Qdrant has applied the points.
+            verbose (bool): Print progress messages. Errors are always printed.
         Returns:
             bool: True if the upload was successful (or partially successful), False if a major error occurred.
         """
-        print(f"Preparing to upload data to '{self.collection_name}'...")
+        if verbose: print(f"Preparing to upload data to '{self.collection_name}'...")
         try:
             if not self.collection_exists():
                 print(f"Error: Collection '{self.collection_name}' does not exist. Attempting to create...")
                 if not self.create_collection(): print("ERROR: Failed to create collection. Aborting upload."); return False
                 else: print(f"Collection '{self.collection_name}' created successfully.")
 
+            # The client serializes a C-contiguous float32 array straight from its buffer; this is a no-op for
+            # embedding_utils output and only copies when given nested lists or another dtype
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
             if not (len(ids) == len(vectors) == len(payloads)):
                 print("ERROR: Mismatch in lengths of ids, vectors, and payloads."); return False
             if not ids:
-                print("No data provided for upload."); return True
+                if verbose: print("No data provided for upload.")
+                return True
+            if vectors.ndim != 2:
+                print(f"ERROR: Expected a 2-D array of vectors, got shape {vectors.shape}."); return False
 
-            print(f"Uploading {len(ids)} points to collection '{self.collection_name}'...") # Batch size info removed, client handles it
-            operation_info = self.client.upsert(
-                collection_name=self.collection_name,
-                points=models.Batch(ids=ids, vectors=vectors, payloads=payloads),
-                wait=True
-            )
-            if operation_info.status == UpdateStatus.COMPLETED:
-                print(f"Successfully uploaded/upserted {len(ids)} points."); return True
-            else:
-                print(f"Warning: Upload/upsert finished with status: {operation_info.status}. Checking count...")
-                count_after = self.count(); print(f"Current collection count: {count_after}"); return True
+            if verbose: print(f"Uploading {len(ids)} points to collection '{self.collection_name}' (batch size {batch_size}, {parallel} parallel workers)...")
+            # Pause index building so the optimizer doesn't rebuild HNSW repeatedly mid-upload
+            with self.deferred_indexing():
+                self.client.upload_collection(
+                    collection_name=self.collection_name,
+                    vectors=vectors,
+                    payload=payloads,
+                    ids=ids,
+                    batch_size=batch_size,
+                    parallel=parallel,
+                    wait=wait
+                )
+            if verbose: print(f"Successfully uploaded/upserted {len(ids)} points.")
+            return True
         except Exception as e:
             print(f"ERROR during data upload to Qdrant collection '{self.collection_name}': {e}"); traceback.print_exc(); return False
 
@@ -161,35 +246,59 @@ class QdrantVectorStore:
         Returns:
             List[models.ScoredPoint]: A list of search results, or an empty list on error.
         """
+        return self.search_many([query_text], top_k=top_k)[0]
+
+    def search_many(self, query_texts: List[str], top_k: int = config.RETRIEVAL_TOP_K) -> List[List[models.ScoredPoint]]:
+        """
+        Searches for several queries at once (e.g. query rewrites), using one embedding call
+        and one batched Qdrant request.
+        Args:
+            query_texts (List[str]): The texts to search for.
+            top_k (int): The maximum number of results to return per query.
+        Returns:
+            List[List[models.ScoredPoint]]: One result list per query, in input order. Lists are empty on error.
+        """
+        no_results = [[] for _ in query_texts]
         print(f"\nPerforming search in '{self.collection_name}'...")
         try:
             if not self.collection_exists():
-                 print(f"Warning: Cannot search. Collection '{self.collection_name}' not found."); return []
+                 print(f"Warning: Cannot search. Collection '{self.collection_name}' not found."); return no_results
+            if not query_texts:
+                 return []
 
-            print(f"  Generating QUERY embedding for: '{query_text[:50]}...'")
+            for query_text in query_texts:
+                print(f"  Generating QUERY embedding for: '{query_text[:50]}...'")
+            import embedding_utils # Imported here so collection management doesn't load the embedding SDK
             # <<< Uses the new embedding_utils.get_embeddings with RETRIEVAL_QUERY >>>
-            query_embedding_list = embedding_utils.get_embeddings(
-                [query_text],
+            query_embeddings = embedding_utils.get_embeddings(
+                query_texts,
                 task_type="RETRIEVAL_QUERY" # Specify task type for query
             )
 
-            if not query_embedding_list or not query_embedding_list[0]:
+            if query_embeddings is None or len(query_embeddings) != len(query_texts):
                  print("ERROR: Could not generate a valid embedding for the query text.")
-                 return []
-            query_embedding = query_embedding_list[0] # Get the single embedding vector
+                 return no_results
 
             print(f"  Searching collection for top {top_k} results...")
-            search_result = self.client.search(
+            # Search the int8 vectors, then rescore the oversampled candidates with the float32 originals
+            search_params = models.SearchParams(
+                hnsw_ef=config.QDRANT_HNSW_EF,
+                quantization=models.QuantizationSearchParams(
+                    ignore=False, rescore=True, oversampling=config.QDRANT_QUANTIZATION_OVERSAMPLING
+                ) if config.QDRANT_SCALAR_QUANTIZATION else None
+            )
+            responses = self.client.query_batch_points(
                 collection_name=self.collection_name,
-                query_vector=query_embedding,
-                query_filter=None,
-                limit=top_k,
-                with_payload=True
+                requests=[
+                    models.QueryRequest(query=query_embedding.tolist(), params=search_params, limit=top_k, with_payload=True)
+                    for query_embedding in query_embeddings
+                ]
             )
-            print(f"  Search returned {len(search_result)} results.")
-            return search_result
+            search_results = [response.points for response in responses]
+            print(f"  Search returned {sum(len(points) for points in search_results)} results.")
+            return search_results
         except Exception as e:
-            print(f"ERROR during search in Qdrant collection '{self.collection_name}': {e}"); traceback.print_exc(); return []
+            print(f"ERROR during search in Qdrant collection '{self.collection_name}': {e}"); traceback.print_exc(); return no_results
 
     def count(self) -> int:
         # ... (Keep this method as previously updated) ...
@@ -205,18 +314,20 @@ class QdrantVectorStore:
         # ... (Keep this method as previously updated) ...
         """Formats Qdrant search results into a single string context."""
         if not docs: return "No relevant context found in the vector store."
-        formatted = []
-        for i, doc in enumerate(docs):
-            content, source, score = "Payload missing or invalid", "Unknown Source", 0.0
-            if hasattr(doc, 'score'): score = doc.score
-            if doc.payload is not None:
-                 content = doc.payload.get("content", "Content not available in payload")
-                 source = doc.payload.get("source", "Source not available in payload")
-            formatted.append(f"Retrieved Document {i+1} (Source: {source}, Score: {score:.4f}):\n{content}")
-        return "\n\n---\n\n".join(formatted)
+        payloads = (doc.payload if doc.payload is not None else _MISSING_PAYLOAD for doc in docs)
+        return "\n\n---\n\n".join(
+            _format_document(
+                index=i,
+                source=payload.get("source", "Source not available in payload"),
+                score=doc.score,
+                content=payload.get("content", "Content not available in payload"),
+            )
+            for i, (doc, payload) in enumerate(zip(docs, payloads), start=1)
+        )
 
 # <<< Updated `if __name__ == '__main__'` block >>>
 if __name__ == '__main__':
+    import embedding_utils
     # Example Usage (requires Qdrant running and GOOGLE_API_KEY)
     print("--- Testing Vector Store Interface (with Google Embeddings) ---")
     try:
@@ -249,7 +360,7 @@ if __name__ == '__main__':
         # Uses the updated embedding_utils function with correct task type
         dummy_embeddings = embedding_utils.get_embeddings(dummy_texts, task_type="RETRIEVAL_DOCUMENT")
 
-        if not dummy_embeddings or len(dummy_embeddings) != len(dummy_texts):
+        if dummy_embeddings is None or len(dummy_embeddings) != len(dummy_texts):
              print("Failed to get embeddings for dummy data. Aborting upload/search test.")
         else:
             dummy_ids = list(range(len(dummy_texts))) # Simple 0, 1, 2 IDs